@@ -0,0 +1,117 @@
+"""Harvest many channels into SQL without the Streamlit UI.
+
+Channel IDs are read one per line from a file, or from stdin when the file is '-'
+or omitted; blank lines and lines starting with '#' are ignored. Channels are
+harvested in parallel through the streaming pipeline, all sharing one API quota
+budget, and one JSON summary line is printed per channel, then a total. Both carry
+count, latency, items and bytes per pipeline stage; --prometheus also writes the
+totals as a Prometheus text file, and --profile-stages runs stages under cProfile:
+
+    python batch_harvest.py channels.txt --workers 4 --incremental
+    cat channels.txt | YOUTUBE_API_KEY=... python batch_harvest.py
+    python batch_harvest.py channels.txt --prometheus /var/lib/node_exporter/youtube.prom
+    python batch_harvest.py channels.txt --profile-stages comment_page,sql_load --profile-dir profiles
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import youtube_data_harvesting_warehousing as ydh
+
+
+def read_channel_ids(lines):
+    channel_ids = []
+    for line in lines:
+        channel_id = line.strip()
+        if channel_id and not channel_id.startswith('#') and channel_id not in channel_ids:
+            channel_ids.append(channel_id)
+    return channel_ids
+
+
+def harvest_one(api_key, channel_id, engine, incremental, comment_workers):
+    """Stream one channel into SQL and summarise what it cost."""
+    usage = ydh.ApiUsage()
+    token = ydh.current_usage.set(usage)
+    metrics = ydh.PipelineMetrics()
+    metrics_token = ydh.current_metrics.set(metrics)
+    started = time.perf_counter()
+    summary = {'channel_id': channel_id, 'status': 'ok'}
+    try:
+        result = ydh.stream_channel_to_sql(api_key, channel_id, engine=engine, incremental=incremental,
+                                           max_workers=comment_workers)
+        summary['rows_written'] = result['rows_written']
+    except ydh.QuotaBudgetExceeded as e:
+        summary.update(status='quota_exceeded', error=str(e))
+    except Exception as e:
+        summary.update(status='error', error=f"{type(e).__name__}: {e}")
+    finally:
+        ydh.current_usage.reset(token)
+        ydh.current_metrics.reset(metrics_token)
+    summary.update(duration_seconds=round(time.perf_counter() - started, 3),
+                   api_requests=usage.requests, quota_spent=usage.quota_spent, stages=metrics.summary())
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('channels', nargs='?', default='-', help="file with one channel ID per line, or '-' for stdin")
+    parser.add_argument('--api-key', default=os.environ.get('YOUTUBE_API_KEY'), help='defaults to $YOUTUBE_API_KEY')
+    parser.add_argument('--database-url', default=ydh.DATABASE_URL)
+    parser.add_argument('--workers', type=int, default=4, help='channels harvested at the same time')
+    parser.add_argument('--comment-workers', type=int, default=ydh.COMMENT_WORKERS, help='comment fetchers per channel')
+    parser.add_argument('--incremental', action='store_true', help='only fetch what changed since the last harvest')
+    parser.add_argument('--daily-quota', type=int, default=ydh.DAILY_QUOTA,
+                        help='quota units all channels may spend together (0 for no limit)')
+    parser.add_argument('--requests-per-second', type=float, default=ydh.REQUESTS_PER_SECOND)
+    parser.add_argument('--prometheus', metavar='PATH', help='write per-stage totals to this file in Prometheus text format')
+    parser.add_argument('--profile-stages', default=','.join(sorted(ydh.pipeline_metrics.profile_stages)),
+                        help="comma-separated stages to run under cProfile, or 'all'")
+    parser.add_argument('--profile-dir', default='profiles', help='where <stage>.prof files are written')
+    args = parser.parse_args(argv)
+    if not args.api_key:
+        parser.error('an API key is required (--api-key or $YOUTUBE_API_KEY)')
+
+    if args.channels == '-':
+        channel_ids = read_channel_ids(sys.stdin)
+    else:
+        with open(args.channels, encoding='utf-8') as f:
+            channel_ids = read_channel_ids(f)
+
+    # Every worker goes through the process-wide scheduler, so the budget is shared
+    scheduler = ydh.get_scheduler()
+    scheduler.daily_quota = args.daily_quota
+    scheduler.requests_per_second = args.requests_per_second
+    ydh.pipeline_metrics.profile_stages = frozenset(filter(None, args.profile_stages.split(',')))
+    # Each worker holds a connection for its loader, so the pool grows with --workers
+    engine = ydh.get_engine(args.database_url, pool_size=max(ydh.SQL_POOL_SIZE, args.workers))
+
+    started = time.perf_counter()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(harvest_one, args.api_key, channel_id, engine, args.incremental, args.comment_workers)
+                   for channel_id in channel_ids]
+        for future in as_completed(futures):
+            summary = future.result()
+            failed += summary['status'] != 'ok'
+            print(json.dumps(summary))
+            sys.stdout.flush()
+
+    print(json.dumps({'channels': len(channel_ids), 'failed': failed,
+                      'duration_seconds': round(time.perf_counter() - started, 3), **scheduler.counters(),
+                      'stages': ydh.pipeline_metrics.summary()}))
+    if args.prometheus:
+        # Written aside and renamed, so a collector never reads a half-written file
+        with open(args.prometheus + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(ydh.pipeline_metrics.prometheus())
+        os.replace(args.prometheus + '.tmp', args.prometheus)
+    if ydh.pipeline_metrics.profiles:
+        for path in ydh.pipeline_metrics.dump_profiles(args.profile_dir):
+            print(f'profile written to {path}', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,780 @@
+"""Offline benchmarks for the harvesting pipeline.
+
+Each scenario runs against the local fake API in fake_youtube_api.py and prints one
+JSON object per measurement, e.g.
+
+    python benchmarks.py comments --videos 300 --latency 0.02
+
+With --output the measurements are also appended to a JSON-lines file, tagged with the
+git commit, time and Python version, and compare flags metrics that got worse between
+two such files:
+
+    python benchmarks.py --output current.jsonl flow
+    python benchmarks.py compare baseline.jsonl current.jsonl --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from googleapiclient.discovery import build
+from sqlalchemy import create_engine, event, text
+
+import youtube_data_harvesting_warehousing as ydh
+from fake_youtube_api import FakeYouTubeServer, SyntheticChannel
+
+API_KEY = 'fake-api-key'
+
+# Set from --output: file the measurements are appended to, and the fields tagging this run
+OUTPUT = None
+RUN_INFO = {}
+
+
+def emit(scenario, **fields):
+    record = dict(scenario=scenario, **fields)
+    print(json.dumps(record))
+    sys.stdout.flush()
+    if OUTPUT:
+        with open(OUTPUT, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(dict(record, **RUN_INFO)) + '\n')
+
+
+def run_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'git_commit': commit, 'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(), 'machine': platform.machine()}
+
+
+def use_fake_api(server):
+    ydh.YOUTUBE_API_ENDPOINT = server.url
+
+
+def use_scheduler(scheduler):
+    """Send the harvester's requests through scheduler instead of the process-wide one."""
+    ydh.get_scheduler = lambda: scheduler
+    return scheduler
+
+
+def bench_comments(args):
+    channel = SyntheticChannel(video_count=args.videos, comments_per_video=args.comments,
+                               comments_disabled_every=10)
+    with FakeYouTubeServer(channel, latency=args.latency) as server:
+        use_fake_api(server)
+        video_ids = [channel.video_id(index) for index in range(channel.video_count)]
+        for workers in args.workers:
+            stats = ydh.HarvestStats()
+            if workers == 1:
+                # The original serial loop from main()
+                for video_id in video_ids:
+                    ydh.get_video_comments(API_KEY, video_id, stats)
+                    stats.record_video()
+            else:
+                for _ in ydh.harvest_comments(API_KEY, video_ids, workers, stats):
+                    pass
+            emit('comments', workers=workers, latency=args.latency, **stats.summary())
+
+
+def bench_retries(args):
+    channel = SyntheticChannel(video_count=args.videos, comments_per_video=args.comments, comments_disabled_every=10)
+    with FakeYouTubeServer(channel, latency=args.latency, error_rate=args.error_rate) as server:
+        use_fake_api(server)
+        # Short backoff so the run measures retry overhead rather than sleeping
+        scheduler = use_scheduler(ydh.RequestScheduler(requests_per_second=0, daily_quota=0, backoff_base=0.01))
+        video_ids = [channel.video_id(index) for index in range(channel.video_count)]
+        stats = ydh.HarvestStats()
+        harvested = sum(len(comments) for _, comments in ydh.harvest_comments(API_KEY, video_ids, args.workers, stats))
+        expected = sum(channel.comment_count(index) for index in range(channel.video_count))
+        emit('retries', error_rate=args.error_rate, errors_injected=server.errors_injected,
+             complete=harvested == expected, **stats.summary(), **scheduler.counters())
+
+
+def harvest_in_memory(channel_id, engine, workers):
+    """The original flow: fetch everything, build DataFrames, then migrate (skipped without an engine)."""
+    started = time.perf_counter()
+    channel_details = ydh.get_channel_details(API_KEY, channel_id)
+    video_ids = []
+    video_details = []
+    for videos, _ in ydh.iter_channel_video_pages(API_KEY, channel_id, uploads_playlist_id=channel_details['uploads_playlist_id']):
+        page_video_ids = [video['id'] for video in videos]
+        video_ids.extend(page_video_ids)
+        video_details.extend(ydh.get_video_details(API_KEY, page_video_ids))
+    comments = [comment for _, video_comments in ydh.harvest_comments(API_KEY, video_ids, workers)
+                for comment in video_comments]
+    # Playlists were fetched after the comments, one after another
+    playlists, items = ydh.harvest_playlists(API_KEY, channel_id, 1)
+    channel_df, videos_df, comments_df, playlists_df, items_df = ydh.create_dataframes(
+        channel_details, video_details, comments, playlists, items)
+    if engine is not None:
+        ydh.migrate_to_sql(channel_df, videos_df, comments_df, engine=engine,
+                           playlists_df=playlists_df, playlist_items_df=items_df)
+    # Nothing is committed before this point
+    elapsed = round(time.perf_counter() - started, 3)
+    return {'rows_written': {'channels': len(channel_df), 'videos': len(videos_df), 'comments': len(comments_df),
+                             'playlists': len(playlists_df), 'playlist_items': len(items_df)},
+            'first_row_seconds': elapsed, 'elapsed_seconds': elapsed}
+
+
+def bench_stream(args):
+    if not args.single:
+        # Peak RSS only ever grows, so measure each mode in a fresh process
+        for mode in args.modes:
+            output = ['--output', OUTPUT] if OUTPUT else []
+            subprocess.run([sys.executable, __file__, *output, 'stream', '--single', mode, '--videos', str(args.videos),
+                            '--comments', str(args.comments), '--latency', str(args.latency),
+                            '--workers', str(args.workers)], check=True)
+        return
+
+    channel = SyntheticChannel(video_count=args.videos, comments_per_video=args.comments)
+    with FakeYouTubeServer(channel, latency=args.latency) as server, tempfile.TemporaryDirectory() as directory:
+        use_fake_api(server)
+        scheduler = use_scheduler(ydh.RequestScheduler(requests_per_second=0, daily_quota=0))
+        engine = create_engine('sqlite:///' + os.path.join(directory, 'stream.db'))
+        if args.single == 'memory':
+            summary = harvest_in_memory(channel.channel_id, engine, args.workers)
+        else:
+            summary = ydh.stream_channel_to_sql(API_KEY, channel.channel_id, engine=engine, max_workers=args.workers)
+        peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        emit('stream', mode=args.single, videos=args.videos, peak_rss_mb=round(peak_rss_kb / 1024, 1),
+             time_to_first_row_seconds=summary['first_row_seconds'], elapsed_seconds=summary['elapsed_seconds'],
+             rows_written=summary['rows_written'])
+
+
+def harvest_serially(channel_id):
+    """The get_* calls as main() made them originally: one video's comments at a time, playlists after them."""
+    channel_details = ydh.get_channel_details(API_KEY, channel_id)
+    videos = ydh.get_all_channel_videos(API_KEY, channel_id, uploads_playlist_id=channel_details['uploads_playlist_id'])
+    video_details = ydh.get_video_details(API_KEY, [video['id'] for video in videos])
+    comments = [comment for video in video_details for comment in ydh.get_video_comments(API_KEY, video['id'])]
+    playlists, items = ydh.harvest_playlists(API_KEY, channel_id, 1)
+    return channel_details, video_details, comments, playlists, items
+
+
+def run_flow(mode, channel_id, engine, incremental, workers):
+    """One harvest of the channel into SQL; returns rows written per table."""
+    if mode == 'streaming':
+        return ydh.stream_channel_to_sql(API_KEY, channel_id, engine=engine, incremental=incremental,
+                                         max_workers=workers)['rows_written']
+    if mode == 'serial':
+        records = harvest_serially(channel_id)
+    else:
+        records = ydh.harvest_channel(API_KEY, channel_id, workers, incremental, engine)
+    channel_df, videos_df, comments_df, playlists_df, items_df = ydh.create_dataframes(*records)
+    if not ydh.migrate_to_sql(channel_df, videos_df, comments_df, engine=engine,
+                              playlists_df=playlists_df, playlist_items_df=items_df):
+        raise RuntimeError('migrate_to_sql failed')
+    return {'channels': len(channel_df), 'videos': len(videos_df), 'comments': len(comments_df),
+            'playlists': len(playlists_df), 'playlist_items': len(items_df)}
+
+
+def bench_flow(args):
+    """The whole flow, get_* -> create_dataframes -> migrate_to_sql, into a fresh SQLite database per mode.
+
+    Each mode harvests the channel once in full and then, except for serial which has no
+    incremental path, once more incrementally. Besides the total, the time spent in every
+    pipeline stage is reported as <stage>_seconds, summed over all threads.
+    """
+    channel = SyntheticChannel(video_count=args.videos, comments_per_video=args.comments, playlist_count=args.playlists,
+                               comments_disabled_every=10, replies_per_thread=args.replies)
+    with FakeYouTubeServer(channel, latency=args.latency) as server, tempfile.TemporaryDirectory() as directory:
+        use_fake_api(server)
+        for mode in args.modes:
+            engine = ydh.get_engine('sqlite:///' + os.path.join(directory, f'{mode}.db'))
+            for run in ('full', 'incremental') if mode != 'serial' else ('full',):
+                scheduler = use_scheduler(ydh.RequestScheduler(requests_per_second=0, daily_quota=0))
+                metrics, usage = ydh.PipelineMetrics(), ydh.ApiUsage()
+                metrics_token, usage_token = ydh.current_metrics.set(metrics), ydh.current_usage.set(usage)
+                started = time.perf_counter()
+                try:
+                    rows_written = run_flow(mode, channel.channel_id, engine, run == 'incremental', args.workers)
+                finally:
+                    ydh.current_metrics.reset(metrics_token)
+                    ydh.current_usage.reset(usage_token)
+                elapsed = time.perf_counter() - started
+                emit('flow', mode=mode, run=run, videos=args.videos, replies=args.replies, latency=args.latency,
+                     workers=args.workers,
+                     elapsed_seconds=round(elapsed, 3), api_requests=usage.requests, rows_written=rows_written,
+                     **{f'{name}_seconds': totals['seconds'] for name, totals in metrics.summary().items()})
+
+
+def bench_cache(args):
+    channel = SyntheticChannel(video_count=args.videos, comments_per_video=args.comments)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'responses.sqlite')
+        server = FakeYouTubeServer(channel, latency=args.latency).start()
+        use_fake_api(server)
+        # cold fills the cache, warm replays it while online, offline replays it with the server stopped
+        for run in ('cold', 'warm', 'offline'):
+            if run == 'offline':
+                server.stop()
+            cache = ydh.ResponseCache(path, offline=(run == 'offline'))
+            scheduler = use_scheduler(ydh.RequestScheduler(requests_per_second=0, daily_quota=0, cache=cache))
+            summary = harvest_in_memory(channel.channel_id, None, args.workers)
+            emit('cache', run=run, elapsed_seconds=summary['elapsed_seconds'], rows=summary['rows_written'],
+                 api_requests=scheduler.counters()['requests'], **cache.counters())
+            cache.close()
+
+
+# The schema and the rewritten queries as they were before indexes, duration_seconds and the aggregate tables
+ORIGINAL_SCHEMA = [
+    """CREATE TABLE channels (id VARCHAR(255) PRIMARY KEY, name VARCHAR(255), subscription_count INTEGER,
+       view_count INTEGER, description TEXT)""",
+    """CREATE TABLE videos (id VARCHAR(255) PRIMARY KEY, channel_id VARCHAR(255) REFERENCES channels (id),
+       title VARCHAR(255), description TEXT, published_at DATETIME, view_count INTEGER, like_count INTEGER,
+       dislike_count INTEGER, favorite_count INTEGER, comment_count INTEGER, duration VARCHAR(50),
+       thumbnail VARCHAR(255), caption_status VARCHAR(50))""",
+    """CREATE TABLE comments (id VARCHAR(255) PRIMARY KEY, video_id VARCHAR(255) REFERENCES videos (id),
+       text TEXT, author VARCHAR(255), published_at DATETIME)""",
+]
+ORIGINAL_QUERIES = dict(ydh.QUERIES)
+ORIGINAL_QUERIES[list(ydh.QUERIES)[1]] = """
+    SELECT channels.name AS Channel_Name, COUNT(videos.id) AS Video_Count
+    FROM channels
+    JOIN videos ON channels.id = videos.channel_id
+    GROUP BY channels.name
+    ORDER BY Video_Count DESC;
+"""
+ORIGINAL_QUERIES[list(ydh.QUERIES)[3]] = """
+    SELECT videos.title AS Video_Name, COUNT(comments.id) AS Comment_Count
+    FROM videos
+    JOIN comments ON videos.id = comments.video_id
+    GROUP BY videos.title;
+"""
+ORIGINAL_QUERIES[list(ydh.QUERIES)[7]] = """
+    SELECT DISTINCT channels.name AS Channel_Name
+    FROM channels
+    JOIN videos ON channels.id = videos.channel_id
+    WHERE YEAR(videos.published_at) = 2022;
+"""
+ORIGINAL_QUERIES[list(ydh.QUERIES)[8]] = """
+    SELECT
+        channels.name AS Channel_Name,
+        AVG(
+            COALESCE(NULLIF(SUBSTRING_INDEX(SUBSTRING_INDEX(videos.duration, 'H', 1), 'PT', -1), '') * 3600, 0) +
+            COALESCE(NULLIF(SUBSTRING_INDEX(SUBSTRING_INDEX(SUBSTRING_INDEX(videos.duration, 'M', 1), 'H', -1), 'PT', -1), '') * 60, 0) +
+            COALESCE(NULLIF(SUBSTRING_INDEX(SUBSTRING_INDEX(videos.duration, 'S', 1), 'M', -1), ''), 0)
+        ) AS Average_Duration_Seconds
+    FROM channels
+    JOIN videos ON channels.id = videos.channel_id
+    GROUP BY channels.name
+"""
+ORIGINAL_QUERIES[list(ydh.QUERIES)[9]] = """
+    SELECT videos.title AS Video_Name, channels.name AS Channel_Name, COUNT(comments.id) AS Comment_Count
+    FROM videos
+    JOIN channels ON videos.channel_id = channels.id
+    JOIN comments ON videos.id = comments.video_id
+    GROUP BY videos.title, channels.name
+    ORDER BY Comment_Count DESC;
+"""
+
+
+def substring_index(value, delimiter, count):
+    """MySQL's SUBSTRING_INDEX, so the original queries run on SQLite."""
+    if value is None:
+        return None
+    parts = value.split(delimiter)
+    return delimiter.join(parts[:count] if count > 0 else parts[count:])
+
+
+def add_mysql_functions(dbapi_connection, connection_record):
+    dbapi_connection.create_function('YEAR', 1, lambda value: int(value[:4]) if value else None, deterministic=True)
+    dbapi_connection.create_function('SUBSTRING_INDEX', 3, substring_index, deterministic=True)
+
+
+def populate_original_schema(engine, args):
+    """Fill the original schema with channels x videos x comments synthetic rows."""
+    connection = engine.raw_connection()
+    cursor = connection.cursor()
+    for statement in ORIGINAL_SCHEMA:
+        cursor.execute(statement)
+    for c in range(args.channels):
+        channel = SyntheticChannel(channel_id=f'UCbench{c:017d}', video_prefix=f'v{c}x',
+                                   video_count=args.videos_per_channel, comments_per_video=args.comments_per_video)
+        cursor.execute('INSERT INTO channels VALUES (?, ?, ?, ?, ?)',
+                       (channel.channel_id, f'Channel {c}', 1000 * c, 50000 * c, 'Synthetic'))
+        # Spread uploads over several years so the 2022 filter is selective
+        channel.epoch = channel.epoch.replace(year=2018 + c % 6)
+        videos = []
+        for index in range(channel.video_count):
+            video = channel.video_resource(index)
+            videos.append((video['id'], channel.channel_id, video['snippet']['title'], video['snippet']['description'],
+                           channel.video_published_at(index).strftime('%Y-%m-%d %H:%M:%S.000000'),
+                           (index * 7919 + c * 104729) % 1000003, (index * 104729) % 50021, 0, 0,
+                           args.comments_per_video, video['contentDetails']['duration'], '', 'false'))
+        cursor.executemany('INSERT INTO videos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', videos)
+        for index in range(channel.video_count):
+            video_id = channel.video_id(index)
+            cursor.executemany('INSERT INTO comments VALUES (?, ?, ?, ?, ?)', [
+                (f'c{video_id}x{position:06d}', video_id, 'Synthetic comment text', f'user{position % 97}',
+                 '2023-01-01 00:00:00.000000')
+                for position in range(args.comments_per_video)
+            ])
+    connection.commit()
+    connection.close()
+
+
+def time_queries(engine, queries, label, repeat):
+    with engine.connect() as connection:
+        for number, (question, query) in enumerate(queries.items(), start=1):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                rows = len(connection.execute(text(query)).fetchall())
+                timings.append(time.perf_counter() - started)
+            emit('queries', schema=label, query=number, rows=rows, best_seconds=round(min(timings), 4),
+                 question=question)
+
+
+def bench_queries(args):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine('sqlite:///' + os.path.join(directory, 'analytics.db'))
+        event.listen(engine, 'connect', add_mysql_functions)
+        started = time.perf_counter()
+        populate_original_schema(engine, args)
+        emit('queries', stage='populate', comments=args.channels * args.videos_per_channel * args.comments_per_video,
+             elapsed_seconds=round(time.perf_counter() - started, 3))
+        time_queries(engine, ORIGINAL_QUERIES, 'before', args.repeat)
+
+        # Upgrade in place, exactly as the app does for an existing database
+        started = time.perf_counter()
+        ydh.ensure_schema(engine)
+        with engine.connect() as connection:
+            connection.exec_driver_sql('ANALYZE')
+        emit('queries', stage='upgrade_schema', elapsed_seconds=round(time.perf_counter() - started, 3))
+        time_queries(engine, ydh.QUERIES, 'after', args.repeat)
+        engine.dispose()
+
+
+def bench_rerun(args):
+    with tempfile.TemporaryDirectory() as directory:
+        url = 'sqlite:///' + os.path.join(directory, 'analytics.db')
+        engine = create_engine(url)
+        event.listen(engine, 'connect', add_mysql_functions)
+        populate_original_schema(engine, args)
+        ydh.ensure_schema(engine)
+        engine.dispose()
+        questions = list(ydh.QUERIES)
+
+        def per_rerun_engine(query):
+            # What every rerun of the query view used to do: a new engine, schema checks, then the query
+            engine = create_engine(url)
+            ydh.ensure_schema(engine)
+            return ydh.execute_query(engine, query)
+
+        def after_migration(query):
+            ydh.invalidate_query_cache()
+            return ydh.get_query_cache().get(ydh.SQLQueryBackend(ydh.get_engine(url)), query)
+
+        for name, run_query in [('per_rerun_engine', per_rerun_engine),
+                                ('pooled_engine', lambda query: ydh.execute_query(ydh.get_engine(url), query)),
+                                ('result_cache', lambda query: ydh.get_query_cache().get(ydh.SQLQueryBackend(ydh.get_engine(url)), query)),
+                                ('result_cache_after_migration', after_migration)]:
+            timings = []
+            for rerun in range(args.reruns):
+                started = time.perf_counter()
+                run_query(ydh.QUERIES[questions[rerun % len(questions)]])
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            emit('rerun', mode=name, reruns=args.reruns, median_ms=round(timings[len(timings) // 2] * 1000, 3),
+                 max_ms=round(timings[-1] * 1000, 3))
+        ydh.get_engine(url).dispose()
+
+
+def bench_client(args):
+    channel = SyntheticChannel(video_count=1)
+    with FakeYouTubeServer(channel) as server:
+        use_fake_api(server)
+
+        def per_call_build():
+            # What every fetch function used to do on entry
+            return build('youtube', 'v3', developerKey=API_KEY, client_options={'api_endpoint': server.url})
+
+        for name, get_client in [('per_call_build', per_call_build),
+                                 ('pooled', lambda: ydh.get_youtube_client(API_KEY))]:
+            started = time.perf_counter()
+            for _ in range(args.calls):
+                get_client().channels().list(part='snippet,statistics', id=channel.channel_id).execute()
+            elapsed = time.perf_counter() - started
+            emit('client', client=name, calls=args.calls, elapsed_seconds=round(elapsed, 3),
+                 ms_per_call=round(elapsed * 1000 / args.calls, 3))
+
+
+def synthetic_records(channel):
+    """The channel, video and comment records the fetch functions return for a synthetic channel."""
+    resource = channel.channel_resource()
+    channel_details = {
+        'id': resource['id'],
+        'name': resource['snippet']['title'],
+        'subscription_count': int(resource['statistics']['subscriberCount']),
+        'view_count': int(resource['statistics']['viewCount']),
+        'description': resource['snippet']['description'],
+    }
+    video_details = []
+    comments = []
+    for index in range(channel.video_count):
+        video = channel.video_resource(index)
+        video_details.append({
+            'id': video['id'],
+            'title': video['snippet']['title'],
+            'description': video['snippet']['description'],
+            'published_at': video['snippet']['publishedAt'],
+            'view_count': int(video['statistics']['viewCount']),
+            'like_count': int(video['statistics']['likeCount']),
+            'dislike_count': 0,
+            'favorite_count': int(video['statistics']['favoriteCount']),
+            'comment_count': int(video['statistics']['commentCount']),
+            'duration': video['contentDetails']['duration'],
+            'thumbnail': video['snippet']['thumbnails']['default']['url'],
+            'caption_status': video['contentDetails']['caption'],
+        })
+        for position in range(channel.comment_count(index)):
+            thread = channel.comment_thread(index, position)
+            comments.append(ydh.comment_record(thread['id'], video['id'], None, thread['snippet']['topLevelComment']['snippet']))
+            for number in range(channel.reply_count(position)):
+                reply = channel.reply(index, position, number)
+                comments.append(ydh.comment_record(reply['id'], video['id'], thread['id'], reply['snippet']))
+    return channel_details, video_details, comments
+
+
+def synthetic_dataframes(channel):
+    """The DataFrames create_dataframes() builds for a synthetic channel, without any API calls."""
+    return ydh.create_dataframes(*synthetic_records(channel), [])
+
+
+def original_create_dataframes(channel_details, video_details, all_comments):
+    """create_dataframes() as it was before vectorisation: one dict per row, timestamps left as strings."""
+    channel_df = pd.DataFrame([{
+        'Channel_Id': channel_details['id'],
+        'Channel_Name': channel_details['name'],
+        'Subscription_Count': channel_details['subscription_count'],
+        'Channel_Views': channel_details['view_count'],
+        'Channel_Description': channel_details['description']
+    }])
+    videos_df = pd.DataFrame([{
+        'Video_Id': video['id'],
+        'Channel_Id': channel_details['id'],
+        'Video_Name': video['title'],
+        'Video_Description': video['description'],
+        'PublishedAt': video['published_at'],
+        'View_Count': video['view_count'],
+        'Like_Count': video['like_count'],
+        'Dislike_Count': video['dislike_count'],
+        'Favorite_Count': video['favorite_count'],
+        'Comment_Count': video['comment_count'],
+        'Duration': video['duration'],
+        'Thumbnail': video['thumbnail'],
+        'Caption_Status': video['caption_status']
+    } for video in video_details])
+    comments_df = pd.DataFrame(all_comments)
+    return channel_df, videos_df, comments_df
+
+
+def original_table_rows(df, columns):
+    """Table rows from an original DataFrame, converting timestamps and durations at load time."""
+    rows = df[list(columns)].rename(columns=columns)
+    if 'published_at' in rows:
+        rows['published_at'] = pd.to_datetime(rows['published_at'], format='%Y-%m-%dT%H:%M:%SZ')
+    if 'duration' in rows:
+        rows['duration_seconds'] = rows['duration'].map(ydh.convert_duration_to_seconds)
+    return rows.to_dict('records')
+
+
+def iterrows_table_rows(df, columns):
+    """Table rows the way the row-by-row load converts them: strptime per row inside iterrows()."""
+    rows = []
+    for _, row in df.iterrows():
+        values = {column: row[name] for name, column in columns.items()}
+        if 'published_at' in values:
+            values['published_at'] = ydh.convert_datetime(values['published_at'])
+        if 'duration' in values:
+            values['duration_seconds'] = ydh.convert_duration_to_seconds(values['duration'])
+        rows.append(values)
+    return rows
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(folder, name)) for folder, _, names in os.walk(path) for name in names)
+
+
+def bench_parquet(args):
+    channel = SyntheticChannel(video_count=args.videos, comments_per_video=args.comments)
+    channel_df, videos_df, comments_df, *_ = synthetic_dataframes(channel)
+    frame_mb = sum(df.memory_usage(deep=True).sum() for df in (channel_df, videos_df, comments_df)) / 2 ** 20
+    with tempfile.TemporaryDirectory() as directory:
+        store = ydh.ParquetStore(os.path.join(directory, 'parquet'))
+        started = time.perf_counter()
+        store.write(channel_df, videos_df, comments_df)
+        emit('parquet', stage='write', videos=len(videos_df), comments=len(comments_df),
+             elapsed_seconds=round(time.perf_counter() - started, 3), frame_mb=round(frame_mb, 1),
+             disk_mb=round(directory_size(store.root) / 2 ** 20, 1))
+
+        # Full scan versus the one column a per-video comment count needs, and one month of videos
+        for label, name, columns, months in [('comments_all_columns', 'comments', None, None),
+                                             ('comments_video_id_only', 'comments', ['video_id'], None),
+                                             ('videos_one_month', 'videos', ['id', 'view_count'], ['2023-12'])]:
+            started = time.perf_counter()
+            rows = len(store.read(name, columns, months=months))
+            emit('parquet', stage='read', read=label, rows=rows, elapsed_seconds=round(time.perf_counter() - started, 3))
+
+        for mode in ('migrate_to_sql', 'parquet_load'):
+            engine = create_engine('sqlite:///' + os.path.join(directory, f'{mode}.db'))
+            started = time.perf_counter()
+            if mode == 'migrate_to_sql':
+                ydh.migrate_to_sql(channel_df, videos_df, comments_df, engine=engine)
+            else:
+                store.load_to_sql(engine)
+            emit('parquet', stage='load', mode=mode, elapsed_seconds=round(time.perf_counter() - started, 3))
+            engine.dispose()
+
+
+def bench_backends(args):
+    with tempfile.TemporaryDirectory() as directory:
+        store = ydh.ParquetStore(os.path.join(directory, 'parquet'))
+        engine = create_engine('sqlite:///' + os.path.join(directory, 'analytics.db'))
+        started = time.perf_counter()
+        for c in range(args.channels):
+            channel = SyntheticChannel(channel_id=f'UCbench{c:017d}', video_prefix=f'v{c}x',
+                                       video_count=args.videos_per_channel, comments_per_video=args.comments_per_video)
+            channel_df, videos_df, comments_df, *_ = synthetic_dataframes(channel)
+            store.write(channel_df, videos_df, comments_df)
+            ydh.migrate_to_sql(channel_df, videos_df, comments_df, engine=engine)
+        emit('backends', stage='populate', elapsed_seconds=round(time.perf_counter() - started, 3))
+
+        backends = [ydh.SQLQueryBackend(engine)]
+        if ydh.duckdb is not None:
+            backends.append(ydh.DuckDBQueryBackend(store))
+        for backend in backends:
+            for number, query in enumerate(ydh.QUERIES.values(), start=1):
+                timings = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    rows = len(backend.run(query))
+                    timings.append(time.perf_counter() - started)
+                emit('backends', backend=backend.name.split(':')[0], query=number, rows=rows,
+                     best_seconds=round(min(timings), 4))
+        engine.dispose()
+
+
+def bench_transform(args):
+    channel = SyntheticChannel(video_count=args.videos, comments_per_video=args.comments)
+    channel_details, video_details, comments = synthetic_records(channel)
+    original_video_columns = {name: column for name, column in ydh.VIDEO_COLUMNS.items() if name != 'Duration_Seconds'}
+    modes = {
+        'iterrows': (original_create_dataframes, iterrows_table_rows, original_video_columns),
+        'original': (original_create_dataframes, original_table_rows, original_video_columns),
+        'vectorised': (lambda *records: ydh.create_dataframes(*records, [])[:3], ydh.dataframe_rows, ydh.VIDEO_COLUMNS),
+    }
+    for mode in args.modes:
+        build_frames, table_rows, video_columns = modes[mode]
+        started = time.perf_counter()
+        channel_df, videos_df, comments_df = build_frames(channel_details, video_details, comments)
+        built = time.perf_counter()
+        frame_mb = sum(df.memory_usage(deep=True).sum() for df in (channel_df, videos_df, comments_df)) / 2 ** 20
+        rows = (len(table_rows(channel_df, ydh.CHANNEL_COLUMNS)) + len(table_rows(videos_df, video_columns))
+                + len(table_rows(comments_df, ydh.COMMENT_COLUMNS)))
+        finished = time.perf_counter()
+        emit('transform', mode=mode, videos=len(videos_df), comments=len(comments_df), rows=rows,
+             build_seconds=round(built - started, 3), convert_seconds=round(finished - built, 3),
+             total_seconds=round(finished - started, 3), frame_mb=round(frame_mb, 1))
+        del channel_df, videos_df, comments_df
+
+
+def bench_migrate(args):
+    channel = SyntheticChannel(video_count=args.videos, comments_per_video=args.comments)
+    channel_df, videos_df, comments_df, *_ = synthetic_dataframes(channel)
+    rows = len(channel_df) + len(videos_df) + len(comments_df)
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in args.modes:
+            engine = create_engine('sqlite:///' + os.path.join(directory, f'{mode}.db'))
+            # First pass inserts everything, second pass hits rows that already exist
+            for run in ('insert', 'reload'):
+                started = time.perf_counter()
+                ok = ydh.migrate_to_sql(channel_df, videos_df, comments_df, engine=engine,
+                                        batch_size=args.batch_size, bulk=(mode == 'bulk'))
+                elapsed = time.perf_counter() - started
+                emit('migrate', mode=mode, run=run, ok=ok, rows=rows, batch_size=args.batch_size,
+                     elapsed_seconds=round(elapsed, 3), rows_per_sec=round(rows / elapsed, 1))
+            engine.dispose()
+
+
+# Fields compare() treats as metrics (lower is better, except rates), and the other fields
+# that tell measurements apart; numbers not listed here, like request counts, are ignored
+METRIC_SUFFIXES = ('_seconds', '_ms', '_mb', '_per_sec')
+KEY_FIELDS = {'videos', 'replies', 'workers', 'latency', 'error_rate', 'batch_size', 'rows', 'calls', 'reruns'}
+RUN_INFO_FIELDS = {'git_commit', 'started_at', 'python', 'machine'}
+
+
+def is_metric(name):
+    return name.endswith(METRIC_SUFFIXES) or name.startswith('ms_')
+
+
+def seconds_per_unit(name):
+    """How many seconds one unit of a timing metric is, or None for sizes and rates."""
+    if name.endswith('_seconds'):
+        return 1.0
+    if name.endswith('_ms') or name.startswith('ms_'):
+        return 0.001
+    return None
+
+
+def load_results(path):
+    """Values of every metric in a results file, keyed on (scenario, identifying fields) and metric name."""
+    results = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            key = tuple(sorted((name, value) for name, value in record.items()
+                               if name not in RUN_INFO_FIELDS and not is_metric(name)
+                               and (isinstance(value, (str, bool)) or name in KEY_FIELDS)))
+            for name, value in record.items():
+                if is_metric(name) and isinstance(value, (int, float)):
+                    results.setdefault(key, {}).setdefault(name, []).append(value)
+    return results
+
+
+def bench_compare(args):
+    """Median of each metric in the baseline vs the current file; exits with 1 if any got worse by more than threshold.
+
+    Timings that moved by less than min_seconds are never flagged, so the shortest stages do not fail on noise.
+    """
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    regressions = 0
+    for key in sorted(baseline.keys() & current.keys()):
+        for name in sorted(baseline[key].keys() & current[key].keys()):
+            before, after = statistics.median(baseline[key][name]), statistics.median(current[key][name])
+            if not before:
+                continue
+            change = (after - before) / before
+            # Rates regress when they fall, everything else when it grows
+            regression = (-change if name.endswith('_per_sec') else change) > args.threshold
+            unit = seconds_per_unit(name)
+            if unit is not None and abs(after - before) * unit < args.min_seconds:
+                regression = False
+            regressions += regression
+            emit('compare', measurement=dict(key), metric=name, baseline=before, current=after,
+                 change=round(change, 3), regression=regression)
+    for key in sorted(baseline.keys() ^ current.keys()):
+        emit('compare', measurement=dict(key), unmatched='baseline' if key in baseline else 'current')
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    global OUTPUT, RUN_INFO
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', metavar='PATH', help='also append every measurement, tagged with this run, to a JSON-lines file')
+    subparsers = parser.add_subparsers(dest='scenario', required=True)
+
+    flow = subparsers.add_parser('flow', help='the full get_* -> create_dataframes -> migrate_to_sql flow into SQLite')
+    flow.add_argument('--videos', type=int, default=500)
+    flow.add_argument('--comments', type=int, default=40, help='base comment threads per video')
+    flow.add_argument('--replies', type=int, default=0,
+                      help='replies on the threads that have them; above 5 they are paged with comments.list')
+    flow.add_argument('--playlists', type=int, default=10)
+    flow.add_argument('--latency', type=float, default=0.005, help='seconds added to every API call')
+    flow.add_argument('--workers', type=int, default=8)
+    flow.add_argument('--modes', nargs='+', choices=['serial', 'concurrent', 'streaming'],
+                      default=['serial', 'concurrent', 'streaming'])
+    flow.set_defaults(run=bench_flow)
+
+    compare = subparsers.add_parser('compare', help='compare two --output files and flag regressions')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.2, help='relative change that counts as a regression')
+    compare.add_argument('--min-seconds', type=float, default=0.05, help='smallest change in a timing that counts')
+    compare.set_defaults(run=bench_compare)
+
+    comments = subparsers.add_parser('comments', help='serial vs concurrent comment harvesting')
+    comments.add_argument('--videos', type=int, default=200)
+    comments.add_argument('--comments', type=int, default=150, help='base comment threads per video')
+    comments.add_argument('--latency', type=float, default=0.02, help='seconds added to every API call')
+    comments.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    comments.set_defaults(run=bench_comments)
+
+    client = subparsers.add_parser('client', help='build() per call vs the pooled per-thread client')
+    client.add_argument('--calls', type=int, default=200)
+    client.set_defaults(run=bench_client)
+
+    migrate = subparsers.add_parser('migrate', help='row-by-row vs bulk upsert load into SQLite')
+    migrate.add_argument('--videos', type=int, default=500)
+    migrate.add_argument('--comments', type=int, default=40, help='base comments per video')
+    migrate.add_argument('--batch-size', type=int, default=ydh.SQL_BATCH_SIZE)
+    migrate.add_argument('--modes', nargs='+', choices=['rows', 'bulk'], default=['rows', 'bulk'])
+    migrate.set_defaults(run=bench_migrate)
+
+    transform = subparsers.add_parser('transform', help='DataFrame construction and type conversion: original vs vectorised')
+    transform.add_argument('--videos', type=int, default=100000)
+    transform.add_argument('--comments', type=int, default=7, help='base comments per video (7 gives 10 on average)')
+    transform.add_argument('--modes', nargs='+', choices=['iterrows', 'original', 'vectorised'],
+                           default=['original', 'vectorised'])
+    transform.set_defaults(run=bench_transform)
+
+    parquet = subparsers.add_parser('parquet', help='Parquet staging: write, projected reads and bulk load into SQLite')
+    parquet.add_argument('--videos', type=int, default=20000)
+    parquet.add_argument('--comments', type=int, default=7, help='base comments per video')
+    parquet.set_defaults(run=bench_parquet)
+
+    backends = subparsers.add_parser('backends', help='the ten queries on SQLite vs DuckDB over the Parquet copy')
+    backends.add_argument('--channels', type=int, default=10)
+    backends.add_argument('--videos-per-channel', type=int, default=2000)
+    backends.add_argument('--comments-per-video', type=int, default=7)
+    backends.add_argument('--repeat', type=int, default=3)
+    backends.set_defaults(run=bench_backends)
+
+    retries = subparsers.add_parser('retries', help='comment harvesting with injected transient API errors')
+    retries.add_argument('--videos', type=int, default=100)
+    retries.add_argument('--comments', type=int, default=150)
+    retries.add_argument('--latency', type=float, default=0.005)
+    retries.add_argument('--error-rate', type=float, default=0.1)
+    retries.add_argument('--workers', type=int, default=8)
+    retries.set_defaults(run=bench_retries)
+
+    stream = subparsers.add_parser('stream', help='peak RSS and time to first row: in-memory flow vs streaming')
+    stream.add_argument('--videos', type=int, default=2000)
+    stream.add_argument('--comments', type=int, default=200)
+    stream.add_argument('--latency', type=float, default=0.0)
+    stream.add_argument('--workers', type=int, default=8)
+    stream.add_argument('--modes', nargs='+', choices=['memory', 'streaming'], default=['memory', 'streaming'])
+    stream.add_argument('--single', choices=['memory', 'streaming'], help=argparse.SUPPRESS)
+    stream.set_defaults(run=bench_stream)
+
+    cache = subparsers.add_parser('cache', help='cold, warm and offline harvests through the response cache')
+    cache.add_argument('--videos', type=int, default=300)
+    cache.add_argument('--comments', type=int, default=100)
+    cache.add_argument('--latency', type=float, default=0.02)
+    cache.add_argument('--workers', type=int, default=8)
+    cache.set_defaults(run=bench_cache)
+
+    queries = subparsers.add_parser('queries', help='the ten analytics queries before and after the schema changes')
+    queries.add_argument('--channels', type=int, default=20)
+    queries.add_argument('--videos-per-channel', type=int, default=500)
+    queries.add_argument('--comments-per-video', type=int, default=100)
+    queries.add_argument('--repeat', type=int, default=3)
+    queries.set_defaults(run=bench_queries)
+
+    rerun = subparsers.add_parser('rerun', help='latency of a query view rerun: engine per rerun vs pooled engine and result cache')
+    rerun.add_argument('--channels', type=int, default=20)
+    rerun.add_argument('--videos-per-channel', type=int, default=500)
+    rerun.add_argument('--comments-per-video', type=int, default=20)
+    rerun.add_argument('--reruns', type=int, default=100)
+    rerun.set_defaults(run=bench_rerun)
+
+    args = parser.parse_args(argv)
+    if args.output and args.scenario != 'compare':
+        OUTPUT, RUN_INFO = args.output, run_info()
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
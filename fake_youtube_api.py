@@ -0,0 +1,377 @@
+"""Local stand-in for the YouTube Data API v3 endpoints used by the harvester.
+
+Serves synthetic channels over HTTP so the real googleapiclient code paths can
+be exercised and timed without network access or quota. Point the harvester at
+it by setting YOUTUBE_API_ENDPOINT (or the module attribute) to ``server.url``.
+"""
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class SyntheticChannel:
+    """Deterministic channel data: videos, comment threads with their replies, and playlists."""
+
+    # Replies the API includes inline in a commentThreads response; the rest need comments.list
+    INLINE_REPLIES = 5
+
+    def __init__(self, channel_id='UCfakechannel0000000000', video_count=100,
+                 comments_per_video=20, playlist_count=5, comments_disabled_every=0, video_prefix='v',
+                 replies_per_thread=0):
+        self.channel_id = channel_id
+        # Distinct prefixes keep video IDs unique when a server hosts several channels
+        self.video_prefix = video_prefix
+        self.uploads_playlist_id = 'UU' + channel_id[2:]
+        self.video_count = video_count
+        self.comments_per_video = comments_per_video
+        self.playlist_count = playlist_count
+        self.comments_disabled_every = comments_disabled_every
+        self.replies_per_thread = replies_per_thread
+        self.epoch = datetime(2023, 12, 31, 12, 0, 0)
+
+    def video_id(self, index):
+        return f'{self.video_prefix}{index:010d}'
+
+    def video_index(self, video_id):
+        suffix = video_id[len(self.video_prefix):]
+        if video_id.startswith(self.video_prefix) and suffix.isdigit():
+            return int(suffix)
+        return None
+
+    def owns(self, identifier):
+        """Whether a channel, playlist or video ID belongs to this channel."""
+        return (identifier in (self.channel_id, self.uploads_playlist_id)
+                or identifier.startswith('PL' + self.channel_id[2:])
+                or self.video_index(identifier) is not None
+                or self.thread_position(identifier) is not None)
+
+    def video_published_at(self, index):
+        # Index 0 is the newest upload, matching the API's newest-first ordering
+        return self.epoch - timedelta(hours=6 * index)
+
+    def comment_count(self, index):
+        if self.comments_disabled(index):
+            return 0
+        # Vary thread counts a little so pagination is not perfectly uniform
+        return self.comments_per_video + (index % 3) * (self.comments_per_video // 2)
+
+    def comments_disabled(self, index):
+        return bool(self.comments_disabled_every) and index % self.comments_disabled_every == 1
+
+    def channel_resource(self):
+        return {
+            'kind': 'youtube#channel',
+            'id': self.channel_id,
+            'snippet': {
+                'title': f'Synthetic channel {self.channel_id}',
+                'description': 'Generated by fake_youtube_api',
+            },
+            'statistics': {
+                'subscriberCount': str(1000 + self.video_count),
+                'viewCount': str(self.video_count * 5000),
+                'videoCount': str(self.video_count),
+            },
+            'contentDetails': {
+                'relatedPlaylists': {'uploads': self.uploads_playlist_id},
+            },
+        }
+
+    def video_snippet(self, index):
+        return {
+            'channelId': self.channel_id,
+            'title': f'Video {index}',
+            'description': f'Description for video {index}',
+            'publishedAt': format_timestamp(self.video_published_at(index)),
+            'thumbnails': {'default': {'url': f'https://i.ytimg.com/vi/{self.video_id(index)}/default.jpg'}},
+        }
+
+    def video_resource(self, index):
+        minutes, seconds = divmod(60 + index * 37 % 5400, 60)
+        hours, minutes = divmod(minutes, 60)
+        duration = 'PT' + (f'{hours}H' if hours else '') + (f'{minutes}M' if minutes else '') + f'{seconds}S'
+        return {
+            'kind': 'youtube#video',
+            'id': self.video_id(index),
+            'snippet': self.video_snippet(index),
+            'statistics': {
+                'viewCount': str(10000 - index % 10000),
+                'likeCount': str(500 - index % 500),
+                'favoriteCount': '0',
+                'commentCount': str(self.comment_count(index)),
+            },
+            'contentDetails': {
+                'duration': duration,
+                'caption': 'true' if index % 4 == 0 else 'false',
+            },
+        }
+
+    def thread_published_at(self, index, position):
+        # Newest comment first, as with order=time
+        return self.video_published_at(index) + timedelta(minutes=self.comment_count(index) - position)
+
+    def reply_count(self, position):
+        # 0, half and all of replies_per_thread in turn, so some threads fit inline and some do not
+        return (position % 3) * self.replies_per_thread // 2
+
+    def thread_position(self, thread_id):
+        """(video index, position) of a comment thread ID, or None when it is not one of ours."""
+        video_id, _, position = thread_id[1:].rpartition('x')
+        index = self.video_index(video_id)
+        if not thread_id.startswith('c') or index is None or not position.isdigit():
+            return None
+        return index, int(position)
+
+    def comment_thread(self, index, position, replies=False):
+        video_id = self.video_id(index)
+        comment_id = f'c{video_id}x{position:06d}'
+        thread = {
+            'kind': 'youtube#commentThread',
+            'id': comment_id,
+            'snippet': {
+                'videoId': video_id,
+                'topLevelComment': {
+                    'id': comment_id,
+                    'snippet': {
+                        'videoId': video_id,
+                        'textDisplay': f'Comment {position} on video {index}',
+                        'authorDisplayName': f'user{position % 97}',
+                        'publishedAt': format_timestamp(self.thread_published_at(index, position)),
+                    },
+                },
+                'totalReplyCount': self.reply_count(position),
+            },
+        }
+        if replies and self.reply_count(position):
+            thread['replies'] = {'comments': [self.reply(index, position, number) for number in
+                                              range(min(self.reply_count(position), self.INLINE_REPLIES))]}
+        return thread
+
+    def reply(self, index, position, number):
+        thread_id = f'c{self.video_id(index)}x{position:06d}'
+        return {
+            'kind': 'youtube#comment',
+            'id': f'{thread_id}.r{number:04d}',
+            'snippet': {
+                'videoId': self.video_id(index),
+                'parentId': thread_id,
+                'textDisplay': f'Reply {number} to comment {position} on video {index}',
+                'authorDisplayName': f'user{(position + number + 1) % 97}',
+                'publishedAt': format_timestamp(self.thread_published_at(index, position) + timedelta(seconds=number + 1)),
+            },
+        }
+
+    def playlist_id(self, index):
+        return f'PL{self.channel_id[2:]}{index:04d}'
+
+    def playlist_resource(self, index):
+        return {
+            'kind': 'youtube#playlist',
+            'id': self.playlist_id(index),
+            'snippet': {
+                'channelId': self.channel_id,
+                'title': f'Playlist {index}',
+                'description': f'Description for playlist {index}',
+                'publishedAt': format_timestamp(self.epoch - timedelta(days=30 * index)),
+            },
+        }
+
+    def playlist_video_indexes(self, playlist_id):
+        if playlist_id == self.uploads_playlist_id:
+            return range(self.video_count)
+        for index in range(self.playlist_count):
+            if self.playlist_id(index) == playlist_id:
+                # Each playlist holds every playlist_count-th video
+                return range(index, self.video_count, self.playlist_count)
+        return None
+
+    def playlist_item(self, playlist_id, position, index):
+        return {
+            'kind': 'youtube#playlistItem',
+            'id': f'{playlist_id}.{position:06d}',
+            'snippet': dict(self.video_snippet(index), playlistId=playlist_id, position=position,
+                            resourceId={'kind': 'youtube#video', 'videoId': self.video_id(index)}),
+            'contentDetails': {
+                'videoId': self.video_id(index),
+                'videoPublishedAt': format_timestamp(self.video_published_at(index)),
+            },
+        }
+
+
+def format_timestamp(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def paginate(keys, params, build, default_size=5, max_size=50):
+    """Slice a sequence the way the API does, with an opaque offset page token.
+
+    Only the requested page is turned into resources with build(position, key).
+    """
+    size = min(int(params.get('maxResults', default_size)), max_size)
+    offset = int(params.get('pageToken') or 0)
+    page = [build(position, keys[position]) for position in range(offset, min(offset + size, len(keys)))]
+    response = {'items': page, 'pageInfo': {'totalResults': len(keys), 'resultsPerPage': size}}
+    if offset + size < len(keys):
+        response['nextPageToken'] = str(offset + size)
+    return response
+
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this keep-alive clients stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        resource = url.path.rstrip('/').rsplit('/', 1)[-1]
+        self.server.record(resource)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.should_fail():
+            return self.send_error_json(503, 'backendError', 'Injected transient failure')
+
+        handler = getattr(self, 'list_' + resource, None)
+        if handler is None:
+            return self.send_error_json(404, 'notFound', f'Unknown resource {resource}')
+        result = handler(self.server.find_channel(params), params)
+        if isinstance(result, tuple):
+            return self.send_error_json(*result)
+        self.send_json(200, result)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, reason, message):
+        self.send_json(status, {'error': {
+            'code': status,
+            'message': message,
+            'errors': [{'reason': reason, 'domain': 'youtube', 'message': message}],
+        }})
+
+    def list_channels(self, channel, params):
+        items = [channel.channel_resource()] if params.get('id') == channel.channel_id else []
+        return {'items': items}
+
+    def list_search(self, channel, params):
+        if params.get('channelId') != channel.channel_id:
+            return {'items': []}
+        published_after = params.get('publishedAfter')
+        indexes = [index for index in range(channel.video_count)
+                   if not published_after or format_timestamp(channel.video_published_at(index)) >= published_after]
+        return paginate(indexes, params, lambda position, index: {
+            'id': {'kind': 'youtube#video', 'videoId': channel.video_id(index)},
+            'snippet': channel.video_snippet(index),
+        })
+
+    def list_videos(self, channel, params):
+        items = []
+        for video_id in params.get('id', '').split(','):
+            index = channel.video_index(video_id)
+            if index is not None and index < channel.video_count:
+                items.append(channel.video_resource(index))
+        return {'items': items}
+
+    def list_commentThreads(self, channel, params):
+        index = channel.video_index(params.get('videoId', ''))
+        if index is None or index >= channel.video_count:
+            return 404, 'videoNotFound', 'The video identified by the videoId parameter could not be found.'
+        if channel.comments_disabled(index):
+            return 403, 'commentsDisabled', 'The video has disabled comments.'
+        size = min(int(params.get('maxResults', 20)), 100)
+        offset = int(params.get('pageToken') or 0)
+        total = channel.comment_count(index)
+        replies = 'replies' in params.get('part', '').split(',')
+        response = {'items': [channel.comment_thread(index, position, replies)
+                              for position in range(offset, min(offset + size, total))]}
+        if offset + size < total:
+            response['nextPageToken'] = str(offset + size)
+        return response
+
+    def list_comments(self, channel, params):
+        thread = channel.thread_position(params.get('parentId', ''))
+        if thread is None or thread[0] >= channel.video_count or thread[1] >= channel.comment_count(thread[0]):
+            return 404, 'commentNotFound', 'The comment identified by the parentId parameter could not be found.'
+        index, position = thread
+        return paginate(range(channel.reply_count(position)), params,
+                        lambda _, number: channel.reply(index, position, number), default_size=20, max_size=100)
+
+    def list_playlists(self, channel, params):
+        if params.get('channelId') != channel.channel_id:
+            return {'items': []}
+        return paginate(range(channel.playlist_count), params, lambda position, index: channel.playlist_resource(index))
+
+    def list_playlistItems(self, channel, params):
+        playlist_id = params.get('playlistId', '')
+        indexes = channel.playlist_video_indexes(playlist_id)
+        if indexes is None:
+            return 404, 'playlistNotFound', 'The playlist identified by the playlistId parameter cannot be found.'
+        return paginate(indexes, params, lambda position, index: channel.playlist_item(playlist_id, position, index))
+
+
+class FakeYouTubeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, channel=None, latency=0.0, error_rate=0.0, seed=0, host='127.0.0.1', port=0, channels=None):
+        super().__init__((host, port), FakeYouTubeHandler)
+        self.channels = list(channels or [channel or SyntheticChannel()])
+        self.channel = self.channels[0]
+        self.latency = latency
+        # Fraction of requests answered with a transient 503, to exercise retries
+        self.error_rate = error_rate
+        self.request_counts = {}
+        self.errors_injected = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/youtube/v3/'
+
+    def record(self, resource):
+        with self._lock:
+            self.request_counts[resource] = self.request_counts.get(resource, 0) + 1
+
+    def find_channel(self, params):
+        for name in ('id', 'channelId', 'playlistId', 'videoId', 'parentId'):
+            identifier = params.get(name, '').split(',')[0]
+            for channel in self.channels:
+                if identifier and channel.owns(identifier):
+                    return channel
+        return self.channel
+
+    def should_fail(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            fail = self._random.random() < self.error_rate
+            self.errors_injected += fail
+            return fail
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
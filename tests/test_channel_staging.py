@@ -0,0 +1,26 @@
+import gc
+import weakref
+
+import numpy as np
+import pandas as pd
+
+import youtube_data_harvesting_warehousing as ydh
+
+
+def test_spilled_frames_are_freed_while_the_summary_is_held(tmp_path):
+    staging = ydh.ChannelStaging(memory_budget=0, root=str(tmp_path))
+    values = np.array([[f'c{i}', f'text {i}', f'user{i % 97}'] for i in range(10000)], dtype=object)
+    values_ref = weakref.ref(values)
+    frames = {'comments': pd.DataFrame(values, columns=['id', 'text', 'author'], copy=False)}
+    assert np.shares_memory(frames['comments']['id'].to_numpy(), values)
+
+    staging.put('key', frames)
+    summary = ydh.staged_channel_summary('UC1', 'key', frames)
+    del frames, values
+    gc.collect()
+
+    assert staging.counters()['spilled'] == 1
+    assert values_ref() is None
+    assert summary['rows'] == {'comments': 10000}
+    assert list(summary['previews']['comments']['id']) == [f'c{i}' for i in range(ydh.STAGING_PREVIEW_ROWS)]
+    assert len(staging.get('key')['comments']) == 10000
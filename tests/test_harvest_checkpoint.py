@@ -0,0 +1,109 @@
+import collections
+
+import pytest
+from googleapiclient.errors import HttpError
+
+import youtube_data_harvesting_warehousing as ydh
+from fake_youtube_api import FakeYouTubeServer, SyntheticChannel
+
+
+@pytest.fixture
+def channel():
+    # Two uploads pages
+    return SyntheticChannel(video_count=60, comments_per_video=5, replies_per_thread=4, comments_disabled_every=7)
+
+
+@pytest.fixture
+def api(monkeypatch, channel):
+    """Start a fake API serving channel; every request goes through a scheduler that never retries."""
+    servers = []
+
+    def serve(**options):
+        server = FakeYouTubeServer(channel, seed=7, **options).start()
+        servers.append(server)
+        monkeypatch.setattr(ydh, 'YOUTUBE_API_ENDPOINT', server.url)
+        scheduler = ydh.RequestScheduler(requests_per_second=0, daily_quota=0, max_retries=0)
+        monkeypatch.setattr(ydh, 'get_scheduler', lambda: scheduler)
+        return server
+
+    yield serve
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    checkpoint = ydh.HarvestCheckpoint(str(tmp_path / 'checkpoint.sqlite'))
+    yield checkpoint
+    checkpoint.close()
+
+
+def expected_comment_ids(channel):
+    ids = []
+    for index in range(channel.video_count):
+        for position in range(channel.comment_count(index)):
+            ids.append(channel.comment_thread(index, position)['id'])
+            ids.extend(channel.reply(index, position, number)['id'] for number in range(channel.reply_count(position)))
+    return ids
+
+
+# Also two commentThreads pages on some videos, and replies beyond the inline five
+@pytest.mark.parametrize('channel', [SyntheticChannel(video_count=55, comments_per_video=101, replies_per_thread=8,
+                                                      comments_disabled_every=2)])
+def test_interrupted_harvests_resume_to_every_comment_once(api, channel, checkpoint):
+    server = api(error_rate=0.01)
+    for attempt in range(1, 101):
+        try:
+            _, videos, comments, _, _ = ydh.harvest_channel('key', channel.channel_id, checkpoint=checkpoint)
+            break
+        except HttpError as e:
+            assert e.status_code == 503
+    else:
+        pytest.fail('the harvest never completed')
+
+    assert attempt > 1 and server.errors_injected >= attempt - 1
+    assert [video['id'] for video in videos] == [channel.video_id(index) for index in range(channel.video_count)]
+    counts = collections.Counter(comment['id'] for comment in comments)
+    assert set(counts.values()) == {1}
+    assert sorted(counts) == sorted(expected_comment_ids(channel))
+
+
+def test_finished_checkpoint_is_not_resumed(api, channel, checkpoint):
+    server = api()
+    first = ydh.harvest_channel('key', channel.channel_id, checkpoint=checkpoint)
+    assert checkpoint.resumable(channel.channel_id) is None
+
+    server.request_counts.clear()
+    second = ydh.harvest_channel('key', channel.channel_id, checkpoint=checkpoint)
+    assert server.request_counts['videos'] == 2
+    assert server.request_counts['commentThreads'] > 0
+    assert sorted(comment['id'] for comment in second[2]) == sorted(comment['id'] for comment in first[2])
+
+
+def test_checkpoint_of_the_other_mode_is_not_resumed(api, channel, checkpoint, tmp_path, monkeypatch):
+    server = api()
+    get_video_details, calls = ydh.get_video_details, []
+
+    def failing_video_details(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise ConnectionError('connection reset')
+        return get_video_details(*args)
+
+    monkeypatch.setattr(ydh, 'get_video_details', failing_video_details)
+    with pytest.raises(ConnectionError):
+        ydh.harvest_channel('key', channel.channel_id, checkpoint=checkpoint)
+    assert checkpoint.resumable(channel.channel_id)['videos'] == 50
+    assert checkpoint.resumable(channel.channel_id, incremental=True) is None
+
+    monkeypatch.setattr(ydh, 'get_video_details', get_video_details)
+    server.request_counts.clear()
+    engine = ydh.get_engine(f'sqlite:///{tmp_path}/empty.db')
+    _, videos, comments, _, _ = ydh.harvest_channel('key', channel.channel_id, incremental=True, engine=engine,
+                                                   checkpoint=checkpoint)
+
+    # Started over: both uploads pages were fetched again, and nothing saved by the full run is replayed
+    assert server.request_counts['videos'] == 2
+    assert len(videos) == channel.video_count
+    assert sorted(comment['id'] for comment in comments) == sorted(expected_comment_ids(channel))
+    assert checkpoint.state(channel.channel_id)['incremental'] is True
@@ -0,0 +1,65 @@
+import pytest
+
+import youtube_data_harvesting_warehousing as ydh
+from fake_youtube_api import FakeYouTubeServer, SyntheticChannel
+
+
+@pytest.fixture
+def channel():
+    # Over 100 threads per video, so commentThreads pages; 8 replies, so some threads need comments.list
+    return SyntheticChannel(video_count=12, comments_per_video=120, replies_per_thread=8, comments_disabled_every=5)
+
+
+@pytest.fixture
+def api(monkeypatch, channel):
+    """Point the harvester at a fake API serving channel, with a fresh scheduler that never waits."""
+    def serve(**options):
+        server = FakeYouTubeServer(channel, **options)
+        server.start()
+        servers.append(server)
+        monkeypatch.setattr(ydh, 'YOUTUBE_API_ENDPOINT', server.url)
+        scheduler = ydh.RequestScheduler(requests_per_second=0, daily_quota=0, max_retries=10,
+                                         sleep=lambda seconds: None)
+        monkeypatch.setattr(ydh, 'get_scheduler', lambda: scheduler)
+        return server
+
+    servers = []
+    yield serve
+    for server in servers:
+        server.stop()
+
+
+def expected_comment_ids(channel, index):
+    ids = set()
+    for position in range(channel.comment_count(index)):
+        thread = channel.comment_thread(index, position)
+        ids.add(thread['id'])
+        ids.update(channel.reply(index, position, number)['id'] for number in range(channel.reply_count(position)))
+    return ids
+
+
+@pytest.mark.parametrize('error_rate', [0.0, 0.1])
+def test_every_comment_is_harvested(api, channel, error_rate):
+    server = api(error_rate=error_rate)
+    video_ids = [channel.video_id(index) for index in range(channel.video_count)]
+
+    harvested = dict(ydh.harvest_comments('key', video_ids, max_workers=4))
+
+    assert set(harvested) == set(video_ids)
+    for index, video_id in enumerate(video_ids):
+        comments = harvested[video_id]
+        assert len(comments) == len({comment['id'] for comment in comments})
+        assert {comment['id'] for comment in comments} == expected_comment_ids(channel, index)
+        assert all(comment['video_id'] == video_id for comment in comments)
+    if error_rate:
+        assert server.errors_injected > 0
+
+
+def test_replies_point_at_their_thread(api, channel):
+    api()
+    comments = dict(ydh.harvest_comments('key', [channel.video_id(0)]))[channel.video_id(0)]
+
+    thread_ids = {comment['id'] for comment in comments if comment['parent_id'] is None}
+    replies = [comment for comment in comments if comment['parent_id'] is not None]
+    assert replies
+    assert all(reply['parent_id'] in thread_ids and reply['id'].startswith(reply['parent_id']) for reply in replies)
@@ -0,0 +1,108 @@
+import json
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import youtube_data_harvesting_warehousing as ydh
+
+
+def http_error(status, reason):
+    content = json.dumps({'error': {'code': status, 'message': reason, 'errors': [{'reason': reason}]}})
+    return HttpError(httplib2.Response({'status': status}), content.encode('utf-8'), uri='https://example.invalid')
+
+
+class FakeRequest:
+    """Raises the given errors in turn, then returns the response."""
+
+    def __init__(self, errors=(), response=None, method_id='youtube.commentThreads.list'):
+        self.methodId = method_id
+        self.errors = list(errors)
+        self.response = response if response is not None else {'items': []}
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.response
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_scheduler(clock, **options):
+    options.setdefault('requests_per_second', 0)
+    options.setdefault('daily_quota', 0)
+    return ydh.RequestScheduler(sleep=clock.sleep, clock=clock, **options)
+
+
+def test_transient_error_is_retried_after_backoff():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, backoff_base=2.0)
+    request = FakeRequest([http_error(503, 'backendError')], {'items': ['ok']})
+
+    assert scheduler.execute(request) == {'items': ['ok']}
+    assert request.calls == 2
+    assert len(clock.sleeps) == 1 and 1.0 <= clock.sleeps[0] <= 2.0
+    assert scheduler.counters()['retries'] == 1
+    assert scheduler.counters()['errors'] == 0
+
+
+def test_retries_stop_after_max_retries():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, max_retries=2)
+    request = FakeRequest([http_error(503, 'backendError')] * 5)
+
+    with pytest.raises(HttpError):
+        scheduler.execute(request)
+    assert request.calls == 3
+    assert scheduler.counters()['errors'] == 1
+
+
+@pytest.mark.parametrize('status, reason', [(403, 'quotaExceeded'), (403, 'commentsDisabled')])
+def test_permanent_errors_are_not_retried(status, reason):
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    request = FakeRequest([http_error(status, reason)])
+
+    with pytest.raises(HttpError) as excinfo:
+        scheduler.execute(request)
+    assert ydh.http_error_reasons(excinfo.value) == {reason}
+    assert request.calls == 1
+    assert clock.sleeps == []
+    assert scheduler.counters()['retries'] == 0
+
+
+def test_quota_budget_is_not_overspent():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, daily_quota=150)
+    scheduler.execute(FakeRequest(method_id='youtube.search.list'))
+
+    search = FakeRequest(method_id='youtube.search.list')
+    with pytest.raises(ydh.QuotaBudgetExceeded):
+        scheduler.execute(search)
+    assert search.calls == 0
+    assert scheduler.quota_spent_today == 100
+
+    # Cheaper requests still fit in what is left
+    scheduler.execute(FakeRequest())
+    assert scheduler.quota_spent_today == 101
+
+
+def test_requests_are_spaced_by_the_rate_limit():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, requests_per_second=4)
+    for _ in range(3):
+        scheduler.execute(FakeRequest())
+    assert clock.sleeps == [0.25, 0.25]
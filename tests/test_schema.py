@@ -0,0 +1,17 @@
+import importlib.util
+
+import youtube_data_harvesting_warehousing as ydh
+
+
+def test_schema_work_is_not_repeated_by_a_rerun(tmp_path, monkeypatch):
+    engine = ydh.get_engine(f'sqlite:///{tmp_path}/rerun.db')
+
+    # streamlit run executes the script in a fresh module on every rerun, while the engine is cached
+    spec = importlib.util.spec_from_file_location('rerun', ydh.__file__)
+    rerun = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(rerun)
+    upgrades = []
+    monkeypatch.setattr(rerun, 'upgrade_schema', upgrades.append)
+
+    rerun.create_session(engine).close()
+    assert upgrades == []
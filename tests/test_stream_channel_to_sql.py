@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import text
+
+import youtube_data_harvesting_warehousing as ydh
+from fake_youtube_api import FakeYouTubeServer, SyntheticChannel
+
+
+@pytest.fixture
+def channel():
+    # Two commentThreads pages per video, and threads whose replies need comments.list
+    return SyntheticChannel(video_count=10, comments_per_video=120, replies_per_thread=8)
+
+
+@pytest.fixture(autouse=True)
+def api(monkeypatch, channel):
+    scheduler = ydh.RequestScheduler(requests_per_second=0, daily_quota=0, sleep=lambda seconds: None)
+    monkeypatch.setattr(ydh, 'get_scheduler', lambda: scheduler)
+    with FakeYouTubeServer(channel) as server:
+        monkeypatch.setattr(ydh, 'YOUTUBE_API_ENDPOINT', server.url)
+        yield server
+
+
+def rows(engine, query):
+    with engine.connect() as connection:
+        return connection.execute(text(query)).fetchall()
+
+
+def test_comment_watermarks_cover_each_video(tmp_path, channel):
+    engine = ydh.get_engine(f'sqlite:///{tmp_path}/stream.db')
+    summary = ydh.stream_channel_to_sql('key', channel.channel_id, engine=engine, batch_size=100)
+
+    expected = sum(channel.comment_count(index) + sum(map(channel.reply_count, range(channel.comment_count(index))))
+                   for index in range(channel.video_count))
+    assert summary['rows_written']['comments'] == expected
+    assert rows(engine, """
+        SELECT COUNT(*) FROM video_sync_state
+        WHERE last_comment_published_at = (SELECT MAX(published_at) FROM comments
+                                           WHERE comments.video_id = video_sync_state.video_id AND parent_id IS NULL)
+    """) == [(channel.video_count,)]
+
+
+def test_interrupted_stream_only_advances_finished_videos(tmp_path, monkeypatch, channel):
+    engine = ydh.get_engine(f'sqlite:///{tmp_path}/interrupted.db')
+    get_comment_replies, calls = ydh.get_comment_replies, []
+
+    def failing_replies(*args):
+        calls.append(args)
+        if len(calls) == 60:
+            raise ConnectionError('connection reset')
+        return get_comment_replies(*args)
+
+    monkeypatch.setattr(ydh, 'get_comment_replies', failing_replies)
+    with pytest.raises(ConnectionError):
+        ydh.stream_channel_to_sql('key', channel.channel_id, engine=engine, batch_size=100)
+    finished = rows(engine, 'SELECT COUNT(*) FROM video_sync_state')[0][0]
+    assert finished < channel.video_count
+
+    monkeypatch.setattr(ydh, 'get_comment_replies', get_comment_replies)
+    ydh.stream_channel_to_sql('key', channel.channel_id, engine=engine, incremental=True)
+    clean = ydh.get_engine(f'sqlite:///{tmp_path}/clean.db')
+    ydh.stream_channel_to_sql('key', channel.channel_id, engine=clean)
+
+    query = 'SELECT id, parent_id FROM comments ORDER BY id'
+    assert rows(engine, query) == rows(clean, query)
+    query = 'SELECT video_id, last_comment_published_at FROM video_sync_state ORDER BY video_id'
+    assert rows(engine, query) == rows(clean, query)
+
+
+def test_incremental_stream_rewrites_only_touched_comment_months(tmp_path, monkeypatch, api):
+    channel = SyntheticChannel(video_count=200, comments_per_video=3)  # two months of uploads
+    api.channels, api.channel = [channel], channel
+    monkeypatch.setattr(ydh, 'PARQUET_ROOT', str(tmp_path / 'parquet'))
+    engine = ydh.get_engine(f'sqlite:///{tmp_path}/parquet.db')
+    ydh.stream_channel_to_sql('key', channel.channel_id, engine=engine)
+    store = ydh.ParquetStore(ydh.PARQUET_ROOT)
+    months_dir = tmp_path / 'parquet' / 'comments' / f'channel_id={channel.channel_id}'
+    files_before = {month.name: sorted(path.name for path in month.iterdir()) for month in months_dir.iterdir()}
+    assert len(files_before) == 2
+
+    # New comments on the five newest videos only
+    comment_count = channel.comment_count
+    monkeypatch.setattr(channel, 'comment_count', lambda index: comment_count(index) + 2 * (index < 5))
+    ydh.stream_channel_to_sql('key', channel.channel_id, engine=engine, incremental=True)
+
+    files_after = {month.name: sorted(path.name for path in month.iterdir()) for month in months_dir.iterdir()}
+    assert files_after['publish_month=2023-11'] == files_before['publish_month=2023-11']
+    assert files_after['publish_month=2023-12'] != files_before['publish_month=2023-12']
+    assert sorted(store.read('comments')['id']) == [comment_id for (comment_id,) in rows(engine, 'SELECT id FROM comments ORDER BY id')]